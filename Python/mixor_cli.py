@@ -8,12 +8,39 @@ import os
 import sys
 import json
 import argparse
+import contextlib
+import errno
 import shutil
 from pathlib import Path
 
 # Ensure proper encoding
 os.environ['PYTHONIOENCODING'] = 'utf-8'
 
+# Cap CUDA allocator split size to avoid fragmentation OOMs on long tracks
+os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'max_split_size_mb:512')
+
+MODEL_NAME = "htdemucs_ft"
+
+# Socket of the persistent worker that keeps the model loaded across calls
+WORKER_SOCKET = os.path.expanduser("~/Library/Application Support/Mixor/mixor.sock")
+
+# Demucs separators are expensive to build (torch import + model weights),
+# so build each (model, device) pair once and reuse it across files
+_MODEL_CACHE = {}
+
+# Worker pool for parallel CPU separation; each worker owns its own separator
+_process_pool = None
+_worker_separator = None
+
+# Set by --quant: int8 dynamic quantization on the CPU path
+_quantize = False
+
+# Single background thread that warms the model while IO is in flight
+_warmup_executor = None
+
+# Detected compute device, cached for the life of the process
+_device = None
+
 
 def emit_progress(progress: float, status: str, step: str):
     """Emit progress update as JSON line for Swift to parse"""
@@ -36,25 +63,331 @@ def emit_result(success: bool, instrumental_path: str = None, vocals_path: str =
 
 
 def get_audio_duration(file_path: Path) -> float:
-    """Get audio duration using ffprobe"""
+    """Get audio duration by reading the container header, not a subprocess"""
+    try:
+        import mutagen
+        return mutagen.File(file_path).info.length
+    except Exception:
+        pass
+    try:
+        import soundfile as sf
+        return sf.info(file_path).duration
+    except Exception:
+        pass
+    # Last resort for exotic containers
     try:
         import subprocess
         result = subprocess.run([
             'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1', str(file_path)
-        ], capture_output=True, text=True)
+            '-of', 'default=noprint_wrappers=1:nokey=1', file_path
+        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
         return float(result.stdout.strip())
     except:
         return None
 
 
+def _fast_move(src: Path, dst: Path):
+    """Move via O(1) rename, copying only when crossing filesystems"""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copyfile(src, dst)
+        os.remove(src)
+
+
+def _demucs_progress(data):
+    """Map Demucs segment callbacks onto the 0.3-0.9 progress window"""
+    try:
+        length = data.get("audio_length") or 0
+        if not length:
+            return
+        models = data.get("models") or 1
+        done = data.get("model_idx_in_bag", 0) * length + data.get("segment_offset", 0)
+        fraction = min(done / (models * length), 1.0)
+        emit_progress(0.3 + 0.6 * fraction, "Separating vocals...", "demucs")
+    except Exception:
+        pass
+
+
+def _compile_model(separator, device: str):
+    """Compile the model forward for CUDA graph replay across segments"""
+    import torch
+
+    # CUDA only: compile is unstable on MPS, and on CPU Inductor needs a
+    # C++ toolchain that end-user machines often lack - those failures
+    # surface lazily at the first forward, not at the wrap below
+    if device != "cuda" or not hasattr(torch, "compile"):
+        return
+    try:
+        # Fall back to eager per-graph instead of raising at first forward
+        torch._dynamo.config.suppress_errors = True
+        # htdemucs_ft loads as a BagOfModels whose own forward is never
+        # called - apply_model dispatches to each sub-model, so compile those
+        models = getattr(separator._model, "models", [separator._model])
+        for model in models:
+            model.forward = torch.compile(
+                model.forward, mode="reduce-overhead", fullgraph=False
+            )
+    except Exception as e:
+        print(f"DEBUG: torch.compile unavailable, staying eager: {e}", file=sys.stderr)
+
+
+@contextlib.contextmanager
+def _mmap_weights():
+    """Patch torch.load so checkpoint reads are mmap'd instead of copied"""
+    import torch
+
+    original = torch.load
+
+    def load(*args, **kwargs):
+        if "mmap" not in kwargs:
+            try:
+                return original(*args, mmap=True, **kwargs)
+            except Exception:
+                pass
+        return original(*args, **kwargs)
+
+    torch.load = load
+    try:
+        yield
+    finally:
+        torch.load = original
+
+
+def _detect_device() -> str:
+    """Pick the compute device once; the probes (and torch import behind
+    them) only run on the first call"""
+    global _device
+    if _device is None:
+        import torch
+
+        if torch.cuda.is_available():
+            _device = "cuda"
+        elif torch.backends.mps.is_available():
+            _device = "mps"
+        else:
+            _device = "cpu"
+    return _device
+
+
+def _warm_separator() -> str:
+    """Background warm-up: import torch, pick the device, load the model"""
+    device = _detect_device()
+    _get_separator(device)
+    return device
+
+
+def _get_warmup_executor():
+    global _warmup_executor
+    if _warmup_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _warmup_executor = ThreadPoolExecutor(max_workers=1)
+    return _warmup_executor
+
+
+def _get_separator(device: str):
+    """Load Demucs in-process once per (model, device) and reuse it"""
+    # Quantized and FP32 variants are different models; cache them apart
+    quantized = device == "cpu" and _quantize
+    separator = _MODEL_CACHE.get((MODEL_NAME, device, quantized))
+    if separator is None:
+        import torch
+        if device == "cuda":
+            # Tensor Core matmuls for the FP32 ops that stay outside autocast
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.set_float32_matmul_precision("high")
+        from demucs.api import Separator
+        # mmap the ~700MB of weights so launch reuses the OS page cache
+        # instead of unpickling a private copy
+        with _mmap_weights():
+            separator = Separator(
+                model=MODEL_NAME,
+                device=device,
+                overlap=0.25,
+                callback=_demucs_progress,
+            )
+        if quantized:
+            _quantize_model(separator)
+        _compile_model(separator, device)
+        _MODEL_CACHE[(MODEL_NAME, device, quantized)] = separator
+    return separator
+
+
+def _quantize_model(separator):
+    """Quantize the Linear/LSTM blocks to dynamic int8 for CPU inference"""
+    import torch
+
+    try:
+        import demucs
+        # Key the cache by demucs version so new weights invalidate it
+        version = getattr(demucs, "__version__", "unknown")
+        cache = _models_dir() / f"{MODEL_NAME}.{version}.int8.pt"
+        if cache.exists():
+            # Whole-module pickle: loading it skips the FP32 quantization pass
+            separator._model = torch.load(cache, map_location="cpu",
+                                          weights_only=False)
+            return
+        quantized = torch.quantization.quantize_dynamic(
+            separator._model, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8
+        )
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        torch.save(quantized, cache)
+        separator._model = quantized
+    except Exception as e:
+        print(f"DEBUG: int8 quantization failed, staying FP32: {e}", file=sys.stderr)
+
+
+def _autocast(device: str):
+    """Half-precision autocast on GPU backends, no-op elsewhere"""
+    import torch
+
+    if device == "cuda":
+        return torch.autocast("cuda", dtype=torch.float16)
+    if device == "mps":
+        try:
+            return torch.autocast("mps", dtype=torch.bfloat16)
+        except Exception:
+            pass
+    return contextlib.nullcontext()
+
+
+def _models_dir() -> Path:
+    return Path(os.path.expanduser("~/Library/Application Support/Mixor/models"))
+
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _process_pool = ProcessPoolExecutor(max_workers=max(1, os.cpu_count() // 2))
+    return _process_pool
+
+
+def _chunk_worker(chunk):
+    """Runs in a worker process: separate one time-slice of the track"""
+    global _worker_separator
+    if _worker_separator is None:
+        from demucs.api import Separator
+        # No progress callback here - workers must not write to stdout
+        _worker_separator = Separator(model=MODEL_NAME, device="cpu", overlap=0.25)
+    import torch
+    origin, separated = _worker_separator.separate_tensor(torch.from_numpy(chunk))
+    return {name: stem.numpy() for name, stem in separated.items()}
+
+
+def _parallel_separate(separator, wav, n_workers: int):
+    """Split the track across CPU workers and crossfade the chunk boundaries"""
+    import math
+    import numpy as np
+    import torch
+
+    length = wav.shape[-1]
+    models = getattr(separator._model, "models", [separator._model])
+    margin = int(models[0].segment * separator.samplerate * 0.25)
+    span = math.ceil(length / n_workers)
+
+    jobs = []
+    bounds = []
+    for i in range(n_workers):
+        start = i * span
+        end = min(start + span, length)
+        if start >= end:
+            break
+        lo = max(0, start - margin)
+        hi = min(length, end + margin)
+        jobs.append(wav[:, lo:hi].numpy())
+        bounds.append((start, end, lo, hi))
+
+    pool = _get_process_pool()
+    results = list(pool.map(_chunk_worker, jobs))
+
+    sources = list(results[0].keys())
+    out = {name: np.zeros((wav.shape[0], length), dtype=np.float32) for name in sources}
+    weight = np.zeros(length, dtype=np.float32)
+    for (start, end, lo, hi), res in zip(bounds, results):
+        w = np.ones(hi - lo, dtype=np.float32)
+        if lo > 0:
+            w[:start - lo] = np.linspace(0.0, 1.0, start - lo, dtype=np.float32)
+        if hi < length:
+            w[end - lo:] = np.linspace(1.0, 0.0, hi - end, dtype=np.float32)
+        weight[lo:hi] += w
+        for name in sources:
+            out[name][:, lo:hi] += res[name] * w
+
+    for name in sources:
+        out[name] /= weight
+    return {name: torch.from_numpy(arr) for name, arr in out.items()}
+
+
+def _load_audio(separator, audio_file: Path):
+    """Read a file as a (channels, time) tensor at the model's samplerate"""
+    import torchaudio
+    from demucs.audio import convert_audio
+
+    wav, sr = torchaudio.load(audio_file)
+    return convert_audio(wav, sr, separator.samplerate, separator.audio_channels)
+
+
+def _to_device(wav, device: str):
+    """Stage through pinned memory so the H2D copy is an async DMA transfer"""
+    if device != "cuda":
+        return wav
+    try:
+        return wav.pin_memory().to(device, non_blocking=True)
+    except Exception:
+        return wav.to(device)
+
+
+def _separate_file(audio_file: Path, instrumental_out: Path, vocals_out: Path, device: str):
+    """Separate one file into instrumental and vocal stems, written as MP3"""
+    from demucs.api import save_audio
+
+    separator = _get_separator(device)
+
+    separated = None
+    origin = None
+    if device == "cpu":
+        # Spread long tracks across CPU workers; short ones don't repay
+        # the chunk overlap
+        origin = _load_audio(separator, audio_file)
+        n_workers = max(1, os.cpu_count() // 2)
+        if n_workers >= 2 and origin.shape[-1] >= n_workers * 30 * separator.samplerate:
+            try:
+                separated = _parallel_separate(separator, origin, n_workers)
+            except Exception as e:
+                print(f"DEBUG: parallel separation failed, using single process: {e}",
+                      file=sys.stderr)
+
+    if separated is None:
+        with _autocast(device):
+            if device == "cuda":
+                # Decode on CPU, then hand Demucs an already-transferred tensor
+                origin = _load_audio(separator, audio_file)
+                _, separated = separator.separate_tensor(_to_device(origin, device))
+            elif origin is not None:
+                # Already decoded for the parallel attempt; don't re-read
+                _, separated = separator.separate_tensor(origin)
+            else:
+                origin, separated = separator.separate_audio_file(audio_file)
+
+    vocals = separated["vocals"].cpu().float()
+    instrumental = origin.cpu().float() - vocals
+
+    save_audio(instrumental, instrumental_out, samplerate=separator.samplerate)
+    save_audio(vocals, vocals_out, samplerate=separator.samplerate)
+
+
 def process_youtube(url: str, output_dir: str):
     """Process YouTube URL: download and separate vocals"""
     # Debug: print Python info
     print(f"DEBUG: Python executable: {sys.executable}", file=sys.stderr)
     print(f"DEBUG: Python version: {sys.version}", file=sys.stderr)
 
-    import torch
+    # Warm torch + the model on a background thread while the download
+    # blocks on the network
+    device_future = _get_warmup_executor().submit(_warm_separator)
 
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
@@ -68,14 +401,6 @@ def process_youtube(url: str, output_dir: str):
     acapellas_dir = output_path / "Acapellas"
     acapellas_dir.mkdir(exist_ok=True)
 
-    # Determine device
-    if torch.cuda.is_available():
-        device = "cuda"
-    elif torch.backends.mps.is_available():
-        device = "mps"
-    else:
-        device = "cpu"
-
     try:
         # Step 1: Download
         emit_progress(0.1, "Downloading audio...", "download")
@@ -90,13 +415,13 @@ def process_youtube(url: str, output_dir: str):
                     ffmpeg_location = path
                     break
 
-        # Match original working yt-dlp options exactly
+        # Keep the intermediate lossless: Demucs reads the WAV directly and
+        # the only MP3 encode is the final stems, not the download
         ydl_opts = {
             'format': 'bestaudio/best',
             'postprocessors': [{
                 'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
+                'preferredcodec': 'wav',
             }],
             'outtmpl': str(temp_dir / '%(title)s.%(ext)s'),
             'quiet': False,
@@ -114,12 +439,21 @@ def process_youtube(url: str, output_dir: str):
             # Clean filename
             safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
 
-            # Find downloaded file
+            # yt-dlp reports the exact post-processed path; trust it and only
+            # fall back to scanning the temp dir (which can miss odd titles)
             audio_file = None
-            for file in temp_dir.glob("*.mp3"):
-                if file.exists():
-                    audio_file = file
-                    break
+            try:
+                audio_file = Path(info['requested_downloads'][0]['filepath'])
+                if not audio_file.exists():
+                    audio_file = None
+            except (KeyError, IndexError, TypeError):
+                audio_file = None
+
+            if audio_file is None:
+                for file in temp_dir.glob("*.wav"):
+                    if file.exists():
+                        audio_file = file
+                        break
 
             if not audio_file:
                 emit_result(False, error="Download failed - audio file not found")
@@ -127,37 +461,17 @@ def process_youtube(url: str, output_dir: str):
 
         emit_progress(0.3, "Processing with Demucs...", "demucs")
 
-        # Step 2: Run Demucs
-        import subprocess
-
-        model = "htdemucs_ft"
-        cmd = [
-            sys.executable, "-m", "demucs",
-            "--two-stems=vocals",
-            "-n", model,
-            "-o", str(output_path),
-            "--device", device,
-            "--mp3",
-            str(audio_file)
-        ]
-
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
+        # Step 2: Separate with in-process Demucs, writing stems to temp first
+        device = device_future.result()
+        output_name = audio_file.stem
+        instrumental_file = temp_dir / f"{output_name}_no_vocals.mp3"
+        vocals_file = temp_dir / f"{output_name}_vocals.mp3"
 
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace', env=env)
-
-        if result.returncode != 0:
-            emit_result(False, error=f"Demucs error: {result.stderr}")
-            return
+        _separate_file(audio_file, instrumental_file, vocals_file, device)
 
         emit_progress(0.9, "Finalizing...", "finalize")
 
         # Step 3: Move output files
-        output_name = audio_file.stem
-        model_dir = output_path / model / output_name
-        instrumental_file = model_dir / "no_vocals.mp3"
-        vocals_file = model_dir / "vocals.mp3"
-
         if not instrumental_file.exists():
             emit_result(False, error="Processing failed - output file not found")
             return
@@ -166,12 +480,11 @@ def process_youtube(url: str, output_dir: str):
         final_instrumental = instrumentals_dir / f"{output_name}.mp3"
         final_acapella = acapellas_dir / f"{output_name}.mp3"
 
-        shutil.move(str(instrumental_file), str(final_instrumental))
+        _fast_move(instrumental_file, final_instrumental)
         if vocals_file.exists():
-            shutil.move(str(vocals_file), str(final_acapella))
+            _fast_move(vocals_file, final_acapella)
 
         # Cleanup
-        shutil.rmtree(model_dir.parent, ignore_errors=True)
         audio_file.unlink(missing_ok=True)
 
         emit_progress(1.0, "Complete!", "done")
@@ -189,30 +502,26 @@ def process_youtube(url: str, output_dir: str):
 
 def process_local_file(file_path: str, output_dir: str):
     """Process local audio file: separate vocals"""
-    import torch
-
     input_file = Path(file_path)
     if not input_file.exists():
         emit_result(False, error=f"File not found: {file_path}")
         return
 
+    # Warm torch + the model while ffprobe reads the duration
+    device_future = _get_warmup_executor().submit(_warm_separator)
+
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
+    temp_dir = output_path / "temp"
+    temp_dir.mkdir(exist_ok=True)
+
     instrumentals_dir = output_path / "Instrumentals"
     instrumentals_dir.mkdir(exist_ok=True)
 
     acapellas_dir = output_path / "Acapellas"
     acapellas_dir.mkdir(exist_ok=True)
 
-    # Determine device
-    if torch.cuda.is_available():
-        device = "cuda"
-    elif torch.backends.mps.is_available():
-        device = "mps"
-    else:
-        device = "cpu"
-
     try:
         emit_progress(0.1, "Preparing audio...", "prepare")
 
@@ -221,37 +530,16 @@ def process_local_file(file_path: str, output_dir: str):
 
         emit_progress(0.2, "Processing with Demucs...", "demucs")
 
-        # Run Demucs
-        import subprocess
-
-        model = "htdemucs_ft"
-        cmd = [
-            sys.executable, "-m", "demucs",
-            "--two-stems=vocals",
-            "-n", model,
-            "-o", str(output_path),
-            "--device", device,
-            "--mp3",
-            str(input_file)
-        ]
-
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace', env=env)
+        # Separate with in-process Demucs, writing stems to temp first
+        device = device_future.result()
+        output_name = input_file.stem
+        instrumental_file = temp_dir / f"{output_name}_no_vocals.mp3"
+        vocals_file = temp_dir / f"{output_name}_vocals.mp3"
 
-        if result.returncode != 0:
-            emit_result(False, error=f"Demucs error: {result.stderr}")
-            return
+        _separate_file(input_file, instrumental_file, vocals_file, device)
 
         emit_progress(0.9, "Finalizing...", "finalize")
 
-        # Move output files
-        output_name = input_file.stem
-        model_dir = output_path / model / output_name
-        instrumental_file = model_dir / "no_vocals.mp3"
-        vocals_file = model_dir / "vocals.mp3"
-
         if not instrumental_file.exists():
             emit_result(False, error="Processing failed - output file not found")
             return
@@ -260,12 +548,9 @@ def process_local_file(file_path: str, output_dir: str):
         final_instrumental = instrumentals_dir / f"{output_name}.mp3"
         final_acapella = acapellas_dir / f"{output_name}.mp3"
 
-        shutil.move(str(instrumental_file), str(final_instrumental))
+        _fast_move(instrumental_file, final_instrumental)
         if vocals_file.exists():
-            shutil.move(str(vocals_file), str(final_acapella))
-
-        # Cleanup
-        shutil.rmtree(model_dir.parent, ignore_errors=True)
+            _fast_move(vocals_file, final_acapella)
 
         emit_progress(1.0, "Complete!", "done")
         emit_result(
@@ -280,26 +565,231 @@ def process_local_file(file_path: str, output_dir: str):
         emit_result(False, error=str(e))
 
 
+def _separate_batch(separator, wavs, device: str):
+    """Stack several tracks into one padded batch for a single GPU forward"""
+    import torch
+    from demucs.apply import apply_model
+
+    lengths = [wav.shape[-1] for wav in wavs]
+    max_len = max(lengths)
+    batch = torch.zeros(len(wavs), wavs[0].shape[0], max_len)
+    # Per-track mean/std normalization, as separate_tensor does around
+    # apply_model; remembered so the outputs can be denormalized below
+    refs = []
+    for i, wav in enumerate(wavs):
+        ref = wav.mean(0)
+        mean = ref.mean()
+        std = ref.std() + 1e-8
+        refs.append((mean, std))
+        batch[i, :, :wav.shape[-1]] = (wav - mean) / std
+
+    with _autocast(device):
+        out = apply_model(separator._model, _to_device(batch, device),
+                          overlap=0.25, device=device, progress=False)
+
+    sources = separator._model.sources
+    results = []
+    for i, length in enumerate(lengths):
+        mean, std = refs[i]
+        # Trim the padding back off and undo the normalization
+        stems = out[i, ..., :length].cpu().float() * std + mean
+        results.append({name: stems[j] for j, name in enumerate(sources)})
+    return results
+
+
+def process_local_files(file_paths, output_dir: str):
+    """Process several local files in one invocation, sharing the loaded model"""
+    input_files = [Path(p) for p in file_paths]
+    for input_file in input_files:
+        if not input_file.exists():
+            emit_result(False, error=f"File not found: {input_file}")
+            return
+
+    # Warm torch + the model while the output dirs are prepared
+    device_future = _get_warmup_executor().submit(_warm_separator)
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    temp_dir = output_path / "temp"
+    temp_dir.mkdir(exist_ok=True)
+
+    instrumentals_dir = output_path / "Instrumentals"
+    instrumentals_dir.mkdir(exist_ok=True)
+
+    acapellas_dir = output_path / "Acapellas"
+    acapellas_dir.mkdir(exist_ok=True)
+
+    try:
+        device = device_future.result()
+        separator = _get_separator(device)
+
+        # On CUDA, one padded batch forward amortizes kernel launches and
+        # fills the GPU; elsewhere files run back-to-back on the same model
+        wavs = None
+        batched = None
+        if device == "cuda" and len(input_files) > 1:
+            try:
+                wavs = [_load_audio(separator, f) for f in input_files]
+                batched = _separate_batch(separator, wavs, device)
+            except Exception as e:
+                print(f"DEBUG: batched forward failed, separating one by one: {e}",
+                      file=sys.stderr)
+                batched = None
+
+        for idx, input_file in enumerate(input_files):
+            try:
+                emit_progress(idx / len(input_files),
+                              f"Processing {input_file.name}...", "demucs")
+
+                output_name = input_file.stem
+                instrumental_file = temp_dir / f"{output_name}_no_vocals.mp3"
+                vocals_file = temp_dir / f"{output_name}_vocals.mp3"
+
+                if batched is not None:
+                    from demucs.api import save_audio
+                    vocals = batched[idx]["vocals"]
+                    instrumental = wavs[idx] - vocals
+                    save_audio(instrumental, instrumental_file,
+                               samplerate=separator.samplerate)
+                    save_audio(vocals, vocals_file,
+                               samplerate=separator.samplerate)
+                else:
+                    _separate_file(input_file, instrumental_file, vocals_file, device)
+
+                final_instrumental = instrumentals_dir / f"{output_name}.mp3"
+                final_acapella = acapellas_dir / f"{output_name}.mp3"
+
+                _fast_move(instrumental_file, final_instrumental)
+                if vocals_file.exists():
+                    _fast_move(vocals_file, final_acapella)
+
+                emit_result(
+                    True,
+                    instrumental_path=str(final_instrumental),
+                    vocals_path=str(final_acapella),
+                    title=output_name,
+                    duration=get_audio_duration(input_file)
+                )
+            except Exception as e:
+                emit_result(False, error=f"{input_file.name}: {e}")
+
+        emit_progress(1.0, "Complete!", "done")
+
+    except Exception as e:
+        emit_result(False, error=str(e))
+
+
+def _connect_worker():
+    """Connect to the persistent worker, spawning it on first use"""
+    import socket
+    import subprocess
+    import time
+
+    def try_connect():
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(WORKER_SOCKET)
+            return conn
+        except OSError:
+            conn.close()
+            return None
+
+    conn = try_connect()
+    if conn is not None:
+        return conn
+
+    # No worker yet: spawn one detached and wait for it to bind the socket
+    # (it accepts connections before the model finishes loading)
+    worker = Path(__file__).with_name("mixor_worker.py")
+    try:
+        subprocess.Popen([sys.executable, worker],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+    except Exception:
+        return None
+
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        conn = try_connect()
+        if conn is not None:
+            return conn
+        time.sleep(0.2)
+    return None
+
+
+def _run_via_worker(request: dict) -> bool:
+    """Hand the job to the persistent worker and relay its JSON stream"""
+    if os.environ.get('MIXOR_NO_WORKER'):
+        return False
+
+    conn = _connect_worker()
+    if conn is None:
+        return False
+    # Relay everything until the worker closes the stream - batch commands
+    # emit one result per file, so the first result is not the end
+    saw_result = False
+    try:
+        with conn, conn.makefile('w', encoding='utf-8') as writer, \
+                conn.makefile('r', encoding='utf-8') as reader:
+            writer.write(json.dumps(request) + "\n")
+            writer.flush()
+            for line in reader:
+                print(line, end='', flush=True)
+                # Non-JSON lines (e.g. yt-dlp's own stdout) are relayed but
+                # only a JSON object with a "success" key counts as a result
+                try:
+                    parsed = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(parsed, dict) and "success" in parsed:
+                    saw_result = True
+    except OSError as e:
+        print(f"DEBUG: worker connection failed: {e}", file=sys.stderr)
+    return saw_result
+
+
 def main():
     parser = argparse.ArgumentParser(description="Mixor CLI for Swift subprocess")
-    parser.add_argument("command", choices=["extract_url", "extract_file"])
+    parser.add_argument("command", choices=["extract_url", "extract_file", "extract_files"])
     parser.add_argument("--url", help="Video URL")
     parser.add_argument("--file", help="Local file path")
+    parser.add_argument("--files", nargs="+", help="Local file paths for batch extraction")
     parser.add_argument("--output", default=os.path.expanduser("~/Library/Application Support/Mixor/Output"))
+    parser.add_argument("--quant", action="store_true",
+                        help="Use int8 dynamic quantization on CPU (faster, slight quality cost)")
 
     args = parser.parse_args()
 
+    global _quantize
+    _quantize = args.quant
+
     if args.command == "extract_url":
         if not args.url:
             emit_result(False, error="URL is required")
             return
-        process_youtube(args.url, args.output)
+        request = {"command": "extract_url", "url": args.url,
+                   "output": args.output, "quant": args.quant}
+        if not _run_via_worker(request):
+            process_youtube(args.url, args.output)
 
     elif args.command == "extract_file":
         if not args.file:
             emit_result(False, error="File path is required")
             return
-        process_local_file(args.file, args.output)
+        request = {"command": "extract_file", "file": args.file,
+                   "output": args.output, "quant": args.quant}
+        if not _run_via_worker(request):
+            process_local_file(args.file, args.output)
+
+    elif args.command == "extract_files":
+        if not args.files:
+            emit_result(False, error="File paths are required")
+            return
+        request = {"command": "extract_files", "files": args.files,
+                   "output": args.output, "quant": args.quant}
+        if not _run_via_worker(request):
+            process_local_files(args.files, args.output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Mixor worker - Long-lived Demucs host behind a Unix domain socket
+Loads the model once and serves JSON requests from mixor_cli.py
+"""
+
+import contextlib
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+import mixor_cli
+
+SOCKET_PATH = os.path.expanduser("~/Library/Application Support/Mixor/mixor.sock")
+DEFAULT_OUTPUT = os.path.expanduser("~/Library/Application Support/Mixor/Output")
+
+
+def _handle(conn):
+    """Serve one request, streaming the JSON progress lines over the socket"""
+    with conn, conn.makefile('r', encoding='utf-8') as reader, \
+            conn.makefile('w', encoding='utf-8') as writer:
+        line = reader.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return
+
+        # mixor_cli emits progress and results on stdout; point stdout at
+        # the socket so the CLI can relay the stream to Swift unchanged
+        with contextlib.redirect_stdout(writer):
+            command = request.get("command")
+            output = request.get("output") or DEFAULT_OUTPUT
+            # The separator cache keys on this, so per-request values are safe
+            mixor_cli._quantize = bool(request.get("quant"))
+            if command == "extract_url":
+                mixor_cli.process_youtube(request.get("url"), output)
+            elif command == "extract_file":
+                mixor_cli.process_local_file(request.get("file"), output)
+            elif command == "extract_files":
+                mixor_cli.process_local_files(request.get("files") or [], output)
+            else:
+                mixor_cli.emit_result(False, error=f"Unknown command: {command}")
+
+
+def main():
+    sock_path = Path(SOCKET_PATH)
+    sock_path.parent.mkdir(parents=True, exist_ok=True)
+    sock_path.unlink(missing_ok=True)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(sock_path))
+    server.listen(1)
+
+    # Bind before warming so clients can connect (and queue) while the
+    # model loads; the first request then starts separation immediately
+    try:
+        mixor_cli._warm_separator()
+    except Exception as e:
+        print(f"DEBUG: model warm-up failed: {e}", file=sys.stderr)
+
+    while True:
+        conn, _ = server.accept()
+        try:
+            _handle(conn)
+        except Exception as e:
+            print(f"DEBUG: worker request failed: {e}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
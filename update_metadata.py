@@ -5,6 +5,7 @@ Script to update track metadata in the Mixor app library
 import json
 import plistlib
 import os
+import re
 from pathlib import Path
 
 # Path to the app's preferences
@@ -48,10 +49,49 @@ METADATA_MAP = {
     "We Will Remember": {"artist": "Braille", "album": "The IV Edition"},
 }
 
+# Patterns match case-insensitively; lowercase them once at import
+_LOWER_MAP = {pattern.lower(): meta for pattern, meta in METADATA_MAP.items()}
+
+# One automaton pass over the filename beats scanning every pattern per track
+try:
+    import ahocorasick
+    _AUTOMATON = ahocorasick.Automaton()
+    for pattern, meta in _LOWER_MAP.items():
+        _AUTOMATON.add_word(pattern, meta)
+    _AUTOMATON.make_automaton()
+except ImportError:
+    _AUTOMATON = None
+
+# Pure-Python fallback index: map each word to the patterns containing it,
+# so a lookup probes one dict entry per filename word instead of scanning
+# every pattern. Input is lowercased first, so words are runs of [a-z0-9] -
+# any punctuation (brackets included) is a separator
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_WORD_INDEX = {}
+for pattern in _LOWER_MAP:
+    for token in _TOKEN_RE.findall(pattern):
+        _WORD_INDEX.setdefault(token, []).append(pattern)
+
 def find_metadata(filename):
     """Find matching metadata for a filename"""
-    for pattern, meta in METADATA_MAP.items():
-        if pattern.lower() in filename.lower():
+    name = filename.lower()
+    if _AUTOMATON is not None:
+        for _, meta in _AUTOMATON.iter(name):
+            return meta
+        return None
+    # Substring-verify only the candidates whose words appear in the filename
+    seen = set()
+    for token in _TOKEN_RE.findall(name):
+        for pattern in _WORD_INDEX.get(token, ()):
+            if pattern in seen:
+                continue
+            seen.add(pattern)
+            if pattern in name:
+                return _LOWER_MAP[pattern]
+    # Index miss: keep the original substring scan as the backstop so glued
+    # forms the tokenizer can't see (e.g. "xsummertimey") still match
+    for pattern, meta in _LOWER_MAP.items():
+        if pattern not in seen and pattern in name:
             return meta
     return None
 
@@ -59,7 +99,8 @@ def update_library():
     # Read plist
     try:
         with open(prefs_path, 'rb') as f:
-            prefs = plistlib.load(f)
+            original_bytes = f.read()
+        prefs = plistlib.loads(original_bytes)
     except FileNotFoundError:
         print(f"Preferences file not found: {prefs_path}")
         return
@@ -92,11 +133,19 @@ def update_library():
                 print(f"  Album: {old_album} -> {meta['album']}")
                 updated_count += 1
 
-    # Save back
-    prefs[library_key] = json.dumps(library).encode('utf-8') if isinstance(library_data, bytes) else json.dumps(library)
+    # Don't rewrite the whole plist when nothing changed
+    if updated_count == 0:
+        print("\nNo tracks needed updating")
+        return
+
+    # Save back, keeping the library's original bytes/str storage type
+    new_library = json.dumps(library)
+    prefs[library_key] = new_library.encode('utf-8') if isinstance(library_data, bytes) else new_library
 
-    with open(prefs_path, 'wb') as f:
-        plistlib.dump(prefs, f)
+    new_bytes = plistlib.dumps(prefs)
+    if new_bytes != original_bytes:
+        with open(prefs_path, 'wb') as f:
+            f.write(new_bytes)
 
     print(f"\nUpdated {updated_count} tracks")
 